@@ -1,5 +1,11 @@
+import asyncio
+import functools
+import hashlib
+import json
 import os
 import re
+import threading
+from collections import OrderedDict
 from pathlib import Path
 
 try:
@@ -8,6 +14,27 @@ except ImportError:
     litellm = None
 
 _BASE = None
+_RAG_CACHE = {}
+_VERDICT_CACHE = OrderedDict()
+_VERDICT_CACHE_MAX = 4096
+_RESOLVED_PATHS = OrderedDict()
+_RESOLVED_PATHS_MAX = 2048
+# Reports per batched LLM call; the golden examples already take ~1k tokens, and a longer
+# prompt would overflow Ollama's default context and silently lose them from the front.
+_LLM_BATCH_SIZE = 8
+# Guards the LRU maps above; reports may be analyzed from several threads at once.
+_CACHE_LOCK = threading.Lock()
+
+# One pass over the report finds every marker. Each alternative is a lookahead so a
+# fallback match never consumes text that a primary pattern would have matched.
+_REPORT_VALUES_RE = re.compile(
+    r"(?=WBC\s+Count:\s*(?P<wbc>[\d.]+))"
+    r"|(?=WBC[^:]*:\s*(?P<wbc_fallback>[\d.]+))"
+    r"|(?=CRP\)?:\s*(?P<crp>[\d.]+))"
+    r"|(?=C-reactive protein[^:]*:\s*(?P<crp_fallback>[\d.]+)\s*mg)"
+    r"|(?=Neutrophils:\s*(?P<neutrophils>[\d.]+)\s*%)",
+    re.IGNORECASE,
+)
 
 def _base():
     global _BASE
@@ -15,7 +42,15 @@ def _base():
         _BASE = Path(__file__).resolve().parent.parent
     return _BASE
 
+# Golden examples are static for the life of the process, so read them once per (n_positive, n_negative).
 def load_rag_examples(n_positive=10, n_negative=10):
+    key = (n_positive, n_negative)
+    if key not in _RAG_CACHE:
+        _RAG_CACHE[key] = _load_rag_examples_uncached(n_positive, n_negative)
+    positive_texts, negative_texts = _RAG_CACHE[key]
+    return list(positive_texts), list(negative_texts)
+
+def _load_rag_examples_uncached(n_positive, n_negative):
     golden_dir = _base() / "dataset" / "hematology_golden"
     positive_dir = golden_dir / "positive"
     negative_dir = golden_dir / "negative"
@@ -31,23 +66,30 @@ def load_rag_examples(n_positive=10, n_negative=10):
             negative_texts.append(f.read_text(encoding="utf-8", errors="replace").strip())
     return positive_texts, negative_texts
 
-def _parse_float_from_text(text, pattern):
-    match = re.search(pattern, text, re.IGNORECASE)
-    if not match:
+def _parse_float(raw):
+    if raw is None:
         return None
     try:
-        return float(match.group(1).replace(",", "."))
-    except (ValueError, IndexError):
+        return float(raw.replace(",", "."))
+    except ValueError:
         return None
 
 def parse_hematology_report(report_text):
-    wbc = _parse_float_from_text(report_text, r"WBC\s+Count:\s*([\d.]+)")
+    # Keep the first match per marker; primary patterns win over fallbacks.
+    first = {}
+    for match in _REPORT_VALUES_RE.finditer(report_text):
+        name = match.lastgroup
+        first.setdefault(name, match.group(name))
+        if name == "wbc":
+            # Every primary WBC match is also a fallback match at the same position.
+            first.setdefault("wbc_fallback", match.group(name))
+    wbc = _parse_float(first.get("wbc"))
     if wbc is None:
-        wbc = _parse_float_from_text(report_text, r"WBC[^:]*:\s*([\d.]+)")
-    crp = _parse_float_from_text(report_text, r"CRP\)?:\s*([\d.]+)")
+        wbc = _parse_float(first.get("wbc_fallback"))
+    crp = _parse_float(first.get("crp"))
     if crp is None:
-        crp = _parse_float_from_text(report_text, r"C-reactive protein[^:]*:\s*([\d.]+)\s*mg")
-    neutrophils = _parse_float_from_text(report_text, r"Neutrophils:\s*([\d.]+)\s*%")
+        crp = _parse_float(first.get("crp_fallback"))
+    neutrophils = _parse_float(first.get("neutrophils"))
     return {"wbc": wbc, "crp": crp, "neutrophils": neutrophils}
 
 def _elevated_from_values(values):
@@ -77,42 +119,93 @@ def _verdict_from_values(values):
     return "uncertain"
 
 
-def check_pneumonia_thresholds(values, report_text=None):
-    wbc = values.get("wbc")
-    crp = values.get("crp")
-    neutrophils = values.get("neutrophils")
-    elevated = _elevated_from_values(values)
-    details = {"wbc": wbc, "crp": crp, "neutrophils": neutrophils, "elevated": elevated}
+def _model_id():
+    model = os.environ.get("OLLAMA_MODEL", "phi3:latest")
+    return f"ollama/{model}"
+
+
+def _details_from_values(values):
+    return {
+        "wbc": values.get("wbc"),
+        "crp": values.get("crp"),
+        "neutrophils": values.get("neutrophils"),
+        "elevated": _elevated_from_values(values),
+    }
+
+
+def _rag_block(label, texts):
+    if not texts:
+        return ""
+    parts = [f"--- {label} ---"]
+    for i, t in enumerate(texts, 1):
+        parts.append(f"[Example {i}]\n{t}")
+    return "\n\n".join(parts)
+
 
+# Formatted once per process; the golden examples never change while running.
+@functools.lru_cache(maxsize=1)
+def _rag_prompt_blocks():
     positive_examples, negative_examples = load_rag_examples()
-    if not positive_examples and not negative_examples:
+    positive_block = _rag_block("Golden examples labeled POSITIVE (pneumonia)", positive_examples)
+    negative_block = _rag_block("Golden examples labeled NEGATIVE (no pneumonia)", negative_examples)
+    return positive_block, negative_block
+
+
+def _report_for_prompt(values, report_text):
+    current = (report_text or "").strip()
+    if not current:
+        current = (
+            f"WBC: {values.get('wbc')}, CRP (mg/L): {values.get('crp')}, "
+            f"Neutrophils (%): {values.get('neutrophils')}"
+        )
+    return current
+
+
+def _verdict_cache_key(model_id, current):
+    return hashlib.blake2b((model_id + current).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _cached_verdict(cache_key):
+    with _CACHE_LOCK:
+        cached = _VERDICT_CACHE.get(cache_key)
+        if cached is not None:
+            _VERDICT_CACHE.move_to_end(cache_key)
+        return cached
+
+
+def _remember_verdict(cache_key, verdict):
+    with _CACHE_LOCK:
+        _VERDICT_CACHE[cache_key] = verdict
+        if len(_VERDICT_CACHE) > _VERDICT_CACHE_MAX:
+            _VERDICT_CACHE.popitem(last=False)
+
+
+def _rag_available():
+    positive_block, negative_block = _rag_prompt_blocks()
+    return bool(positive_block or negative_block)
+
+
+# Verdict that needs no LLM call (fallback rules or a clear rule verdict), else None.
+def _verdict_without_llm(values):
+    if not _rag_available():
         return _check_pneumonia_fallback(values)
 
     if litellm is None:
         return _check_pneumonia_fallback(values)
 
+    # Nothing parsed from the report: there is nothing for the rules or the LLM to judge.
+    if all(values.get(k) is None for k in ("wbc", "crp", "neutrophils")):
+        return "uncertain", _details_from_values(values)
+
     rule_verdict = _verdict_from_values(values)
     if rule_verdict in ("true", "false"):
-        return rule_verdict, details
+        return rule_verdict, _details_from_values(values)
+    return None
 
-    model = os.environ.get("OLLAMA_MODEL", "phi3:latest")
-    model_id = f"ollama/{model}"
-
-    def block(label, texts):
-        if not texts:
-            return ""
-        parts = [f"--- {label} ---"]
-        for i, t in enumerate(texts, 1):
-            parts.append(f"[Example {i}]\n{t}")
-        return "\n\n".join(parts)
-
-    positive_block = block("Golden examples labeled POSITIVE (pneumonia)", positive_examples)
-    negative_block = block("Golden examples labeled NEGATIVE (no pneumonia)", negative_examples)
-    current = (report_text or "").strip()
-    if not current:
-        current = f"WBC: {wbc}, CRP (mg/L): {crp}, Neutrophils (%): {neutrophils}"
 
-    prompt = f"""You are classifying a hematology report for pneumonia. Use the golden examples below as reference.
+def _single_report_prompt(current):
+    positive_block, negative_block = _rag_prompt_blocks()
+    return f"""You are classifying a hematology report for pneumonia. Use the golden examples below as reference.
 
 {positive_block}
 
@@ -123,29 +216,173 @@ def check_pneumonia_thresholds(values, report_text=None):
 
 Based on the golden examples, is this report more like POSITIVE (pneumonia) or NEGATIVE (no pneumonia)? Reply with exactly one word: true, false, or uncertain."""
 
+
+def _verdict_from_completion(out):
+    text = (out.choices[0].message.content or "").strip().lower()
+    verdict = _parse_verdict(text)
+    if verdict and verdict not in ("true", "false", "uncertain"):
+        verdict = "uncertain"
+    if not verdict:
+        verdict = "uncertain"
+    return verdict
+
+
+def check_pneumonia_thresholds(values, report_text=None):
+    early = _verdict_without_llm(values)
+    if early is not None:
+        return early
+
+    details = _details_from_values(values)
+    model_id = _model_id()
+    current = _report_for_prompt(values, report_text)
+
+    cache_key = _verdict_cache_key(model_id, current)
+    cached = _cached_verdict(cache_key)
+    if cached is not None:
+        return cached, details
+
     try:
         out = litellm.completion(
             model=model_id,
-            messages=[{"role": "user", "content": prompt}],
+            messages=[{"role": "user", "content": _single_report_prompt(current)}],
+            max_tokens=20,
+            temperature=0,
+        )
+        verdict = _verdict_from_completion(out)
+        _remember_verdict(cache_key, verdict)
+        return verdict, details
+    except Exception:
+        return _check_pneumonia_fallback(values)
+
+
+# Non-blocking check_pneumonia_thresholds so many reports can wait on Ollama concurrently.
+async def check_pneumonia_thresholds_async(values, report_text=None):
+    early = _verdict_without_llm(values)
+    if early is not None:
+        return early
+
+    details = _details_from_values(values)
+    model_id = _model_id()
+    current = _report_for_prompt(values, report_text)
+
+    cache_key = _verdict_cache_key(model_id, current)
+    cached = _cached_verdict(cache_key)
+    if cached is not None:
+        return cached, details
+
+    try:
+        out = await litellm.acompletion(
+            model=model_id,
+            messages=[{"role": "user", "content": _single_report_prompt(current)}],
             max_tokens=20,
             temperature=0,
         )
-        text = (out.choices[0].message.content or "").strip().lower()
-        verdict = _parse_verdict(text)
-        if verdict and verdict not in ("true", "false", "uncertain"):
-            verdict = "uncertain"
-        if not verdict:
-            verdict = "uncertain"
+        verdict = _verdict_from_completion(out)
+        _remember_verdict(cache_key, verdict)
         return verdict, details
     except Exception:
         return _check_pneumonia_fallback(values)
 
 
+# Ask the LLM about several reports in one round-trip; returns {report number: verdict}.
+def _llm_batch_verdicts(model_id, reports):
+    positive_block, negative_block = _rag_prompt_blocks()
+    report_blocks = "\n\n".join(
+        f"[Report {i}]\n{text}" for i, text in enumerate(reports, 1)
+    )
+
+    prompt = f"""You are classifying hematology reports for pneumonia. Use the golden examples below as reference.
+
+{positive_block}
+
+{negative_block}
+
+--- Reports to classify ---
+{report_blocks}
+
+Based on the golden examples, classify each report as POSITIVE (pneumonia) or NEGATIVE (no pneumonia).
+Return ONLY a JSON array with one object per report, e.g. [{{"id": 1, "verdict": "true"}}], where verdict is exactly one of: true, false, uncertain."""
+
+    out = litellm.completion(
+        model=model_id,
+        messages=[{"role": "user", "content": prompt}],
+        max_tokens=20 * len(reports) + 20,
+        temperature=0,
+    )
+    text = (out.choices[0].message.content or "").strip()
+    start = text.find("[")
+    end = text.rfind("]")
+    if start == -1 or end == -1 or end <= start:
+        raise ValueError(f"Batch LLM did not return a JSON array: {text}")
+    parsed = json.loads(text[start:end + 1])
+
+    verdicts = {}
+    for item in parsed:
+        if not isinstance(item, dict):
+            continue
+        try:
+            report_id = int(item.get("id"))
+        except (TypeError, ValueError):
+            continue
+        verdict = _parse_verdict(str(item.get("verdict", "")).strip().lower())
+        verdicts[report_id] = verdict or "uncertain"
+    return verdicts
+
+
+# Batched check_pneumonia_thresholds over (values, report_text) pairs. Reports settled by the
+# rules or the verdict cache skip the LLM; the rest share one completion, and any report
+# missing from the reply is retried on its own.
+def check_pneumonia_thresholds_batch(items):
+    model_id = _model_id()
+    results = [None] * len(items)
+    pending = []
+
+    for index, (values, report_text) in enumerate(items):
+        early = _verdict_without_llm(values)
+        if early is not None:
+            results[index] = early
+            continue
+
+        cache_key = _verdict_cache_key(model_id, _report_for_prompt(values, report_text))
+        cached = _cached_verdict(cache_key)
+        if cached is not None:
+            results[index] = (cached, _details_from_values(values))
+            continue
+        pending.append((index, cache_key))
+
+    for start in range(0, len(pending), _LLM_BATCH_SIZE):
+        group = pending[start:start + _LLM_BATCH_SIZE]
+        try:
+            verdicts = _llm_batch_verdicts(
+                model_id,
+                [_report_for_prompt(*items[index]) for index, _ in group],
+            )
+        except Exception:
+            verdicts = {}
+
+        for number, (index, cache_key) in enumerate(group, 1):
+            values, report_text = items[index]
+            verdict = verdicts.get(number)
+            if verdict is None:
+                results[index] = check_pneumonia_thresholds(values, report_text=report_text)
+                continue
+            _remember_verdict(cache_key, verdict)
+            results[index] = (verdict, _details_from_values(values))
+
+    return results
+
+
+# A verdict word either as a whitespace-separated token or at the very start of the text.
+_VERDICT_WORD_RE = re.compile(r"^(true|false|uncertain)|(?<!\S)(true|false|uncertain)(?!\S)")
+
+
 def _parse_verdict(text):
     if not text:
         return None
+    # One scan of the LLM reply; "true" still wins over "false" over "uncertain".
+    found = {match.group(1) or match.group(2) for match in _VERDICT_WORD_RE.finditer(text)}
     for word in ("true", "false", "uncertain"):
-        if word in text.split() or text.startswith(word):
+        if word in found:
             return word
     return None
 
@@ -177,18 +414,36 @@ def _check_pneumonia_fallback(values):
     return "uncertain", details
 
 
+def _is_file_present(path):
+    try:
+        path.stat()
+    except OSError:
+        return False
+    return True
+
+
+# Relative paths are looked up under the dataset reports first, then the repo root.
+# Only successful lookups are cached, so a report added later is still found.
 def _resolve_report_path(report_path):
     path = Path(report_path)
+    if path.is_absolute():
+        return path
+
+    key = str(report_path)
+    resolved = _RESOLVED_PATHS.get(key)
+    if resolved is not None:
+        return resolved
+
     base = _base()
-    dataset_reports = base / "dataset" / "heamatology_reports"
-    if not path.is_absolute():
-        candidate = dataset_reports / path
-        if candidate.exists():
-            return candidate
-        if (base / path).exists():
-            return base / path
-        return candidate
-    return path
+    candidate = base / "dataset" / "heamatology_reports" / path
+    for resolved in (candidate, base / path):
+        if _is_file_present(resolved):
+            with _CACHE_LOCK:
+                _RESOLVED_PATHS[key] = resolved
+                if len(_RESOLVED_PATHS) > _RESOLVED_PATHS_MAX:
+                    _RESOLVED_PATHS.popitem(last=False)
+            return resolved
+    return candidate
 
 # Turn verdict and values into a short human-readable interpretation.
 def _interpretation_text(verdict, values, elevated):
@@ -231,29 +486,31 @@ def _interpretation_text(verdict, values, elevated):
 
     return "".join(parts)
 
-# Run hematology agent and return a human-readable interpretation
-def analyze(report_path=None, report_text=None):
+def _no_report_result(explanation):
+    return {
+        "triggered": False,
+        "decision": "uncertain",
+        "verdict": "uncertain",
+        "explanation": explanation,
+    }
+
+
+# Returns (report_text, None) or (None, result) when the report cannot be read.
+def _load_report(report_path=None, report_text=None):
     if report_text is None and report_path is None:
-        return {
-            "triggered": False,
-            "decision": "uncertain",
-            "verdict": "uncertain",
-            "explanation": "Hematology: No report provided.",
-        }
+        return None, _no_report_result("Hematology: No report provided.")
 
     if report_text is None:
         path = _resolve_report_path(report_path)
-        if not path.exists():
-            return {
-                "triggered": False,
-                "decision": "uncertain",
-                "verdict": "uncertain",
-                "explanation": f"Hematology: Report file not found: {report_path}",
-            }
-        report_text = path.read_text(encoding="utf-8", errors="replace")
+        # No exists() pre-check: read_text's own open reports a missing file.
+        try:
+            report_text = path.read_text(encoding="utf-8", errors="replace")
+        except FileNotFoundError:
+            return None, _no_report_result(f"Hematology: Report file not found: {report_path}")
+    return report_text, None
 
-    values = parse_hematology_report(report_text)
-    verdict, details = check_pneumonia_thresholds(values, report_text=report_text)
+
+def _build_result(verdict, values, details):
     elevated = details.get("elevated", [])
     interpretation = _interpretation_text(verdict, values, elevated)
 
@@ -274,6 +531,70 @@ def analyze(report_path=None, report_text=None):
     }
 
 
+# Run hematology agent and return a human-readable interpretation
+def analyze(report_path=None, report_text=None):
+    report_text, missing = _load_report(report_path=report_path, report_text=report_text)
+    if missing is not None:
+        return missing
+
+    values = parse_hematology_report(report_text)
+    verdict, details = check_pneumonia_thresholds(values, report_text=report_text)
+    return _build_result(verdict, values, details)
+
+
+# Same as analyze() for many reports, sharing one LLM round-trip for the uncertain ones.
+def analyze_batch(report_paths):
+    results = [None] * len(report_paths)
+    items = []
+    indices = []
+    for index, report_path in enumerate(report_paths):
+        report_text, missing = _load_report(report_path=report_path)
+        if missing is not None:
+            results[index] = missing
+            continue
+        items.append((parse_hematology_report(report_text), report_text))
+        indices.append(index)
+
+    verdicts = check_pneumonia_thresholds_batch(items)
+    for index, (values, _), (verdict, details) in zip(indices, items, verdicts):
+        results[index] = _build_result(verdict, values, details)
+    return results
+
+
+async def analyze_async(report_path=None, report_text=None):
+    report_text, missing = _load_report(report_path=report_path, report_text=report_text)
+    if missing is not None:
+        return missing
+
+    values = parse_hematology_report(report_text)
+    verdict, details = await check_pneumonia_thresholds_async(values, report_text=report_text)
+    return _build_result(verdict, values, details)
+
+
 def run(report_path=None, report_text=None):
     result = analyze(report_path=report_path, report_text=report_text)
     return result["explanation"]
+
+
+def run_batch(report_paths):
+    return [result["explanation"] for result in analyze_batch(report_paths)]
+
+
+async def run_async(report_path=None, report_text=None):
+    result = await analyze_async(report_path=report_path, report_text=report_text)
+    return result["explanation"]
+
+
+# Run many reports concurrently; the semaphore caps in-flight Ollama requests.
+async def run_many(report_paths, max_concurrent=8):
+    semaphore = asyncio.Semaphore(max_concurrent)
+
+    async def run_one(report_path):
+        async with semaphore:
+            return await run_async(report_path=report_path)
+
+    return await asyncio.gather(*(run_one(path) for path in report_paths))
+
+
+def run_many_sync(report_paths, max_concurrent=8):
+    return asyncio.run(run_many(report_paths, max_concurrent=max_concurrent))
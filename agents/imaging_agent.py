@@ -1,5 +1,11 @@
+import contextlib
+import hashlib
+import importlib.util
 import os
 import logging
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from PIL import Image
 
@@ -7,12 +13,27 @@ import torch
 import torch.nn as nn
 import transformers
 from torchvision import transforms, models
-from transformers import AutoImageProcessor, AutoModelForImageClassification, AutoProcessor
+from torchvision.io import ImageReadMode, decode_image, read_file
+from torchvision.transforms.functional import pil_to_tensor
+from transformers import (
+    AutoImageProcessor,
+    AutoModelForImageClassification,
+    AutoProcessor,
+    StoppingCriteria,
+    StoppingCriteriaList,
+)
+
+# 4-bit explainer loading needs bitsandbytes plus accelerate (for device_map); both are
+# optional and only imported by transformers if that load is attempted.
+_QUANTIZATION_AVAILABLE = all(
+    importlib.util.find_spec(name) is not None for name in ("bitsandbytes", "accelerate")
+)
 
 
 DENSENET_MODEL_PATH = "model/rsna_densenet121_best_f1.pt"
 CLASSIFIER_MODEL_ID = "lxyuan/vit-xray-pneumonia-classification"
 EXPLAINER_MODEL_ID = "chaoyinshe/llava-med-v1.5-mistral-7b-hf"
+EXPLANATION_MAX_NEW_TOKENS = 96
 
 CUT_POINTS = [
     0.0,
@@ -28,6 +49,8 @@ CUT_POINTS = [
     1.0,
 ]
 
+_SENTENCE_END_RE = re.compile(r"[A-Za-z)\]]\.(\s|$)")
+
 logger = logging.getLogger(__name__)
 if not logger.handlers:
     logging.basicConfig(level=logging.INFO, format="[%(levelname)s] %(name)s: %(message)s")
@@ -37,9 +60,15 @@ _MODEL_INIT_ERROR = None
 _classifier_model = None
 _alt_classifier_processor = None
 _alt_classifier_model = None
+_INIT_LOCK = threading.Lock()
+# Per-thread pinned staging buffers, since claims may be classified concurrently.
+_classifier_input = threading.local()
+_alt_id2label = {}
+_alt_id2positive = {}
 _explainer_processor = None
 _explainer_model = None
 _ROOT_DIR = Path(__file__).resolve().parents[1]
+EXPLANATION_CACHE_DIR = _ROOT_DIR / ".cache" / "explanations"
 
 
 def _load_env_file():
@@ -48,15 +77,16 @@ def _load_env_file():
         logger.info("No .env found at %s; continuing without file-based env vars.", env_path)
         return
 
-    for raw_line in env_path.read_text(encoding="utf-8").splitlines():
-        line = raw_line.strip()
-        if not line or line.startswith("#") or "=" not in line:
-            continue
-        key, value = line.split("=", 1)
-        key = key.strip()
-        value = value.strip().strip('"').strip("'")
-        if key and key not in os.environ:
-            os.environ[key] = value
+    with env_path.open("r", encoding="utf-8") as fh:
+        for raw_line in fh:
+            line = raw_line.strip()
+            if not line or line.startswith("#") or "=" not in line:
+                continue
+            key, value = line.split("=", 1)
+            key = key.strip()
+            value = value.strip().strip('"').strip("'")
+            if key and key not in os.environ:
+                os.environ[key] = value
     logger.info("Loaded environment variables from %s", env_path)
 
 
@@ -91,6 +121,13 @@ def _log_device_context() -> None:
     )
 
 
+def _autocast():
+    # fp16 autocast on accelerators; CPU inference stays in fp32.
+    if _DEVICE in {"cuda", "mps"}:
+        return torch.autocast(device_type=_DEVICE, dtype=torch.float16)
+    return contextlib.nullcontext()
+
+
 def _from_pretrained_with_auth(model_cls, model_id, **kwargs):
     if _HF_TOKEN:
         try:
@@ -133,19 +170,37 @@ def _load_explainer_model(model_id):
         "AutoModelForCausalLM",
     ]
 
-    kwargs = {"torch_dtype": torch.float16} if _DEVICE in {"cuda", "mps"} else {}
+    base_kwargs = {"torch_dtype": torch.float16} if _DEVICE in {"cuda", "mps"} else {}
+    # Try 4-bit first where possible, then the plain fp16/fp32 load if that fails.
+    attempts = [True, False] if _DEVICE == "cuda" and _QUANTIZATION_AVAILABLE else [False]
     last_error = None
 
-    for class_name in preferred_classes:
-        model_cls = getattr(transformers, class_name, None)
-        if model_cls is None:
-            continue
-        try:
-            logger.info("Trying explainer loader class: %s", class_name)
-            return _from_pretrained_with_auth(model_cls, model_id, **kwargs).to(_DEVICE)
-        except Exception as exc:
-            last_error = exc
-            logger.warning("Explainer loader %s failed: %s", class_name, exc)
+    for quantized in attempts:
+        kwargs = dict(base_kwargs)
+        if quantized:
+            # 4-bit NF4 weights: ~4 GB instead of ~14 GB; bitsandbytes places the shards itself.
+            kwargs["quantization_config"] = transformers.BitsAndBytesConfig(
+                load_in_4bit=True,
+                bnb_4bit_compute_dtype=torch.float16,
+                bnb_4bit_quant_type="nf4",
+            )
+            kwargs["device_map"] = {"": 0}
+
+        for class_name in preferred_classes:
+            model_cls = getattr(transformers, class_name, None)
+            if model_cls is None:
+                continue
+            try:
+                logger.info("Trying explainer loader class: %s (4-bit=%s)", class_name, quantized)
+                model = _from_pretrained_with_auth(model_cls, model_id, **kwargs)
+                return model if quantized else model.to(_DEVICE)
+            except Exception as exc:
+                last_error = exc
+                logger.warning("Explainer loader %s failed: %s", class_name, exc)
+
+        if quantized:
+            logger.warning("4-bit explainer load failed; retrying without quantization.")
+            torch.cuda.empty_cache()
 
     raise RuntimeError(
         "Unable to load explainer model with available transformers classes. "
@@ -156,9 +211,10 @@ def _load_explainer_model(model_id):
 # -----------------------------
 # DenseNet helpers
 # -----------------------------
+# Operates on CHW uint8 tensors from _load_image; antialiased resize matches PIL's bilinear resize.
 _eval_tfm = transforms.Compose([
-    transforms.Resize((224, 224)),
-    transforms.ToTensor(),
+    transforms.Resize((224, 224), antialias=True),
+    transforms.ConvertImageDtype(torch.float32),
     transforms.Normalize(mean=(0.485, 0.456, 0.406),
                          std=(0.229, 0.224, 0.225)),
 ])
@@ -196,26 +252,61 @@ def map_decile_to_band(decile: int) -> str:
     return "UNCERTAIN"
 
 
-def initialize_imaging_models():
-    """Load DenseNet (primary classifier), HF ViT (alt classifier), and explainer VLM."""
-    global _MODELS_READY
-    global _MODEL_INIT_ERROR
+def _is_positive_label(label):
+    return "pneumonia" in label or label in ("1", "positive", "yes", "true")
+
+
+class _CompiledWithFallback:
+    # Each new batch size (1-16 here) recompiles on first use, outside the warmup; if any
+    # compiled call fails, switch to the eager model for good instead of failing the claim.
+    def __init__(self, compiled, eager):
+        self._compiled = compiled
+        self._eager = eager
+
+    def __call__(self, *args, **kwargs):
+        if self._compiled is not None:
+            try:
+                return self._compiled(*args, **kwargs)
+            except Exception as exc:
+                logger.warning(
+                    "Compiled %s failed; switching to eager model: %s", type(self._eager).__name__, exc
+                )
+                self._compiled = None
+        return self._eager(*args, **kwargs)
+
+
+def _compile_with_warmup(model, *args, **kwargs):
+    # The warmup pass lets cuDNN pick kernels at init, not on the first claim. torch.compile
+    # is lazy, so the same pass triggers compilation; keep the eager model if that fails.
+    if hasattr(torch, "compile"):
+        try:
+            compiled = torch.compile(model, mode="reduce-overhead", fullgraph=False)
+            with torch.inference_mode(), _autocast():
+                compiled(*args, **kwargs)
+            logger.info("Compiled %s with torch.compile.", type(model).__name__)
+            return _CompiledWithFallback(compiled, model)
+        except Exception as exc:
+            logger.warning("torch.compile failed for %s; using eager model: %s", type(model).__name__, exc)
+
+    with torch.inference_mode(), _autocast():
+        model(*args, **kwargs)
+    return model
+
+
+def _load_imaging_models():
     global _classifier_model
     global _alt_classifier_processor, _alt_classifier_model
+    global _alt_id2label, _alt_id2positive
     global _explainer_processor, _explainer_model
 
-    if _MODELS_READY:
-        logger.info("Imaging models already initialized.")
-        return
-    if _MODEL_INIT_ERROR is not None:
-        logger.error("Previous imaging model init failure detected: %s", _MODEL_INIT_ERROR)
-        raise RuntimeError(
-            f"Imaging model initialization failed earlier: {_MODEL_INIT_ERROR}"
-        ) from _MODEL_INIT_ERROR
-
     _log_device_context()
     logger.info("Initializing imaging models on device: %s", _DEVICE)
 
+    if _DEVICE == "cuda":
+        # Inputs are always 224x224, so let cuDNN pick the fastest conv kernels once.
+        torch.set_float32_matmul_precision("high")
+        torch.backends.cudnn.benchmark = True
+
     # Load local DenseNet checkpoint (primary classifier)
     ckpt_path = _ROOT_DIR / DENSENET_MODEL_PATH
     checkpoint = torch.load(ckpt_path, map_location=_DEVICE)
@@ -223,76 +314,130 @@ def initialize_imaging_models():
     _classifier_model = build_densenet121(num_classes=2).to(_DEVICE)
     _classifier_model.load_state_dict(checkpoint["state_dict"])
     _classifier_model.eval()
+    if _DEVICE == "cuda":
+        _classifier_model = _compile_with_warmup(
+            _classifier_model, torch.zeros((1, 3, 224, 224), device=_DEVICE)
+        )
 
     # Load HF ViT alt classifier (used when DenseNet prob < 0.9)
     _alt_classifier_processor = _from_pretrained_with_auth(
         AutoImageProcessor, CLASSIFIER_MODEL_ID
     )
+    alt_kwargs = {"torch_dtype": torch.float16} if _DEVICE in {"cuda", "mps"} else {}
     _alt_classifier_model = _from_pretrained_with_auth(
-        AutoModelForImageClassification, CLASSIFIER_MODEL_ID
+        AutoModelForImageClassification, CLASSIFIER_MODEL_ID, **alt_kwargs
     ).to(_DEVICE)
     _alt_classifier_model.eval()
+    _alt_id2label = {
+        int(idx): str(label).lower().strip()
+        for idx, label in _alt_classifier_model.config.id2label.items()
+    }
+    _alt_id2positive = {idx: _is_positive_label(label) for idx, label in _alt_id2label.items()}
+    if _DEVICE == "cuda":
+        warmup_inputs = _alt_classifier_processor(
+            images=Image.new("RGB", (224, 224)), return_tensors="pt"
+        )
+        _alt_classifier_model = _compile_with_warmup(
+            _alt_classifier_model, pixel_values=warmup_inputs["pixel_values"].to(_DEVICE)
+        )
 
     # Load explainer VLM
     _explainer_processor = _from_pretrained_with_auth(AutoProcessor, EXPLAINER_MODEL_ID)
     _explainer_model = _load_explainer_model(EXPLAINER_MODEL_ID)
     _explainer_model.eval()
 
-    _MODELS_READY = True
-    logger.info("Imaging models initialized successfully.")
 
+def initialize_imaging_models():
+    """Load DenseNet (primary classifier), HF ViT (alt classifier), and explainer VLM.
 
-def classify_alt_pneumonia(image_path):
-    # return pneumonia flag and probability (HF ViT classifier, used when DenseNet prob < 0.9)
-    initialize_imaging_models()
-    logger.info("Running alt pneumonia classification for image: %s", image_path)
-    image = Image.open(image_path).convert("RGB")
+    Called lazily on first use; a failed load is remembered and re-raised on later calls.
+    """
+    global _MODELS_READY
+    global _MODEL_INIT_ERROR
+
+    if _MODELS_READY:
+        logger.info("Imaging models already initialized.")
+        return
+
+    # Concurrent first calls must not load the models twice.
+    with _INIT_LOCK:
+        if _MODELS_READY:
+            return
+        if _MODEL_INIT_ERROR is not None:
+            logger.error("Previous imaging model init failure detected: %s", _MODEL_INIT_ERROR)
+            raise RuntimeError(
+                f"Imaging model initialization failed earlier: {_MODEL_INIT_ERROR}"
+            ) from _MODEL_INIT_ERROR
+
+        try:
+            _load_imaging_models()
+        except Exception as exc:
+            _MODEL_INIT_ERROR = exc
+            logger.exception("Imaging model initialization failed: %s", exc)
+            raise
+
+        _MODELS_READY = True
+        logger.info("Imaging models initialized successfully.")
+
+
+def _decode_rgb(data, image_path):
+    # Decode straight to a CHW uint8 tensor; PIL only for formats torchvision.io cannot read.
+    try:
+        return decode_image(data, mode=ImageReadMode.RGB)
+    except (RuntimeError, ValueError):
+        return pil_to_tensor(Image.open(image_path).convert("RGB"))
+
+
+def _load_image(image_path):
+    # Raw file bytes (hashed for the explanation cache) and the decoded image, from one read.
+    data = read_file(str(image_path))
+    return data, _decode_rgb(data, image_path)
 
-    inputs = _alt_classifier_processor(images=image, return_tensors="pt")
+
+def _load_images(image_paths):
+    # Decoding releases the GIL, so images are loaded in parallel.
+    with ThreadPoolExecutor(max_workers=min(8, max(1, len(image_paths)))) as executor:
+        return list(executor.map(_load_image, image_paths))
+
+
+def _open_rgb(image_path):
+    return _load_image(image_path)[1]
+
+
+def _classify_alt_images(images):
+    inputs = _alt_classifier_processor(images=images, return_tensors="pt")
     inputs = {k: v.to(_DEVICE) for k, v in inputs.items()}
 
-    with torch.no_grad():
+    with torch.inference_mode(), _autocast():
         logits = _alt_classifier_model(**inputs).logits
-        probs = torch.softmax(logits, dim=-1)[0]
-        predicted_idx = int(torch.argmax(probs).item())
-        predicted_label = (
-            _alt_classifier_model.config.id2label.get(predicted_idx, str(predicted_idx))
-            .lower()
-            .strip()
-        )
-        pneumonia_probability = float(probs[predicted_idx].item())
-        pneumonia_positive = "pneumonia" in predicted_label or predicted_label in (
-            "1",
-            "positive",
-            "yes",
-            "true",
+        probs = torch.softmax(logits.float(), dim=-1)
+        predicted = torch.argmax(probs, dim=-1)
+        predicted_probs = probs.gather(-1, predicted.unsqueeze(-1)).squeeze(-1)
+
+    results = []
+    for predicted_idx, pneumonia_probability in zip(predicted.tolist(), predicted_probs.tolist()):
+        predicted_label = _alt_id2label.get(predicted_idx, str(predicted_idx))
+        pneumonia_positive = _alt_id2positive.get(predicted_idx)
+        if pneumonia_positive is None:
+            pneumonia_positive = _is_positive_label(predicted_label)
+        results.append(
+            {
+                "pneumonia_positive": pneumonia_positive,
+                "probability": pneumonia_probability,
+                "predicted_label": predicted_label,
+            }
         )
-
-    return {
-        "pneumonia_positive": pneumonia_positive,
-        "probability": pneumonia_probability,
-        "predicted_label": predicted_label,
-    }
+    return results
 
 
-def classify_pneumonia(image_path):
+def classify_alt_pneumonia(image_path):
+    # return pneumonia flag and probability (HF ViT classifier, used when DenseNet prob < 0.9)
     initialize_imaging_models()
-    logger.info("Running DenseNet pneumonia classification for image: %s", image_path)
+    logger.info("Running alt pneumonia classification for image: %s", image_path)
+    return _classify_alt_images([_open_rgb(image_path)])[0]
 
-    image = Image.open(image_path).convert("RGB")
-    x = _eval_tfm(image).unsqueeze(0).to(_DEVICE)
 
-    with torch.no_grad():
-        logits = _classifier_model(x)
-        probs = torch.softmax(logits, dim=-1)[0]
-        pneumonia_probability = float(probs[1].item())   # class 1 = pneumonia
-
-    logger.info("DenseNet probability: %.4f", pneumonia_probability)
-    if (pneumonia_probability > 0.4 and pneumonia_probability < 0.9):
-        alt_classification = classify_alt_pneumonia(image_path)
-        pneumonia_probability = alt_classification["probability"]
-        pneumonia_positive = alt_classification["pneumonia_positive"]
-        predicted_label = alt_classification["predicted_label"]
+def _band_result(pneumonia_probability):
     decile = assign_decile(pneumonia_probability, CUT_POINTS)
     band_label = map_decile_to_band(decile)
 
@@ -305,6 +450,64 @@ def classify_pneumonia(image_path):
     }
 
 
+def _stage_classifier_input(tensors):
+    if _DEVICE != "cuda":
+        return torch.stack(tensors).to(_DEVICE)
+
+    # Stack into a reused pinned staging buffer so the H2D copy can run asynchronously.
+    # Results are read back with .tolist() before the next call, so the buffer is free again.
+    shape = (len(tensors),) + tuple(tensors[0].shape)
+    buf = getattr(_classifier_input, "buf", None)
+    if buf is None or buf.shape[0] < shape[0] or buf.shape[1:] != shape[1:]:
+        buf = torch.empty(shape, dtype=tensors[0].dtype, pin_memory=True)
+        _classifier_input.buf = buf
+    staged = torch.stack(tensors, out=buf[: shape[0]])
+    return staged.to(_DEVICE, non_blocking=True)
+
+
+def _classify_images(images):
+    # One DenseNet forward for the whole batch; borderline images go to the ViT together.
+    x = _stage_classifier_input([_eval_tfm(image) for image in images])
+
+    with torch.inference_mode(), _autocast():
+        logits = _classifier_model(x)
+        probs = torch.softmax(logits.float(), dim=-1)[:, 1]   # class 1 = pneumonia
+    pneumonia_probabilities = probs.tolist()
+
+    borderline = []
+    for i, pneumonia_probability in enumerate(pneumonia_probabilities):
+        logger.info("DenseNet probability: %.4f", pneumonia_probability)
+        if (pneumonia_probability > 0.4 and pneumonia_probability < 0.9):
+            borderline.append(i)
+
+    if borderline:
+        alt_classifications = _classify_alt_images([images[i] for i in borderline])
+        for i, alt_classification in zip(borderline, alt_classifications):
+            pneumonia_probabilities[i] = alt_classification["probability"]
+
+    return [_band_result(p) for p in pneumonia_probabilities]
+
+
+def classify_pneumonia(image_path):
+    initialize_imaging_models()
+    logger.info("Running DenseNet pneumonia classification for image: %s", image_path)
+    return _classify_images([_open_rgb(image_path)])[0]
+
+
+def _classify_in_batches(images, batch_size=16):
+    results = []
+    for start in range(0, len(images), batch_size):
+        results.extend(_classify_images(images[start:start + batch_size]))
+    return results
+
+
+def classify_pneumonia_batch(image_paths, batch_size=16):
+    initialize_imaging_models()
+    logger.info("Running DenseNet pneumonia classification for %d images.", len(image_paths))
+    images = [image for _, image in _load_images(image_paths)]
+    return _classify_in_batches(images, batch_size=batch_size)
+
+
 def _log_classification_result(result):
     logger.info(
         "Classifier result: band=%s, probability=%.4f, decile=%s",
@@ -314,18 +517,70 @@ def _log_classification_result(result):
     )
 
 
+def _explanation_cache_path(data, status):
+    # Greedy decoding is deterministic, so the same image, label and model give the same text.
+    digest = hashlib.sha256(data.numpy())
+    digest.update(f"{EXPLAINER_MODEL_ID}:{EXPLANATION_MAX_NEW_TOKENS}:{status}".encode("utf-8"))
+    return EXPLANATION_CACHE_DIR / f"{digest.hexdigest()}.txt"
+
+
+class _StopOnSentenceEnd(StoppingCriteria):
+    """Stop generation once the newly generated text ends a sentence."""
+
+    def __init__(self, tokenizer, prompt_length, tail_tokens=8):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.tail_tokens = tail_tokens
+
+    def __call__(self, input_ids, scores, **kwargs):
+        done = []
+        for row in input_ids:
+            tail = row[self.prompt_length:][-self.tail_tokens:]
+            text = self.tokenizer.decode(tail, skip_special_tokens=True)
+            # A period after a letter or bracket, not a list marker such as "1. ".
+            done.append(bool(_SENTENCE_END_RE.search(text)))
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+
+def _generate_explanation_ids(inputs):
+    tokenizer = getattr(_explainer_processor, "tokenizer", _explainer_processor)
+    stopping_criteria = StoppingCriteriaList(
+        [_StopOnSentenceEnd(tokenizer, inputs["input_ids"].shape[-1])]
+    )
+    with torch.inference_mode():
+        return _explainer_model.generate(
+            **inputs,
+            max_new_tokens=EXPLANATION_MAX_NEW_TOKENS,
+            do_sample=False,
+            eos_token_id=getattr(tokenizer, "eos_token_id", None),
+            stopping_criteria=stopping_criteria,
+        )
+
+
 def generate_pneumonia_explanation(image_path, pneumonia_positive, probability):
+    data = read_file(str(image_path))
+    return _explain_image(image_path, data, None, pneumonia_positive, probability)
+
+
+# Explanation for an already-read image; `image` is decoded from `data` only on a cache miss.
+def _explain_image(image_path, data, image, pneumonia_positive, probability):
+    status = "positive" if pneumonia_positive else "negative"
+    cache_path = _explanation_cache_path(data, status)
+    if cache_path.exists():
+        logger.info("Using cached explanation for image: %s", image_path)
+        return cache_path.read_text(encoding="utf-8")
+
     initialize_imaging_models()
     logger.info(
         "Preparing explanation call for image: %s (pneumonia=%s, prob=%.4f)",
         image_path,
-        "positive" if pneumonia_positive else "negative",
+        status,
         probability,
     )
 
-    image = Image.open(image_path).convert("RGB")
-    status = "positive" if pneumonia_positive else "negative"
-    
+    if image is None:
+        image = _decode_rgb(data, image_path)
+
     if status == "positive":
         question_text = (
             f"This chest X-ray suggests {status} for pneumonia. "
@@ -344,8 +599,7 @@ def generate_pneumonia_explanation(image_path, pneumonia_positive, probability):
     inputs = {k: v.to(_DEVICE) if hasattr(v, "to") else v for k, v in inputs.items()}
     generated_ids = None
     try:
-        with torch.no_grad():
-            generated_ids = _explainer_model.generate(**inputs, max_new_tokens=220)
+        generated_ids = _generate_explanation_ids(inputs)
     except ValueError as exc:
         # Some checkpoints are strict about image-token alignment. Retry with a minimal prompt.
         if "Image features and image tokens do not match" not in str(exc):
@@ -359,8 +613,7 @@ def generate_pneumonia_explanation(image_path, pneumonia_positive, probability):
             k: v.to(_DEVICE) if hasattr(v, "to") else v
             for k, v in retry_inputs.items()
         }
-        with torch.no_grad():
-            generated_ids = _explainer_model.generate(**retry_inputs, max_new_tokens=220)
+        generated_ids = _generate_explanation_ids(retry_inputs)
         inputs = retry_inputs
 
     # Decode only newly generated tokens to avoid prompt-echo cleanup issues.
@@ -370,10 +623,27 @@ def generate_pneumonia_explanation(image_path, pneumonia_positive, probability):
         generated_only, skip_special_tokens=True
     ).strip()
     logger.info("Explanation generated successfully.")
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    # Write-then-rename so a concurrent reader never sees a partial explanation.
+    tmp_path = cache_path.with_name(f"{cache_path.name}.{threading.get_ident()}.tmp")
+    tmp_path.write_text(explanation, encoding="utf-8")
+    os.replace(tmp_path, cache_path)
     return explanation
 
 
 
+def _imaging_result(image_path, classification, explanation):
+    return {
+        "triggered": True,
+        "image_path": image_path,
+        "pneumonia_positive": classification["pneumonia_positive"],
+        "probability": classification["probability"],
+        "decile": classification["decile"],
+        "band_label": classification["band_label"],
+        "explanation": explanation,
+    }
+
+
 def analyze_imaging(image_path):
     """
     Trigger function:
@@ -382,25 +652,43 @@ def analyze_imaging(image_path):
       3) keep VLM plumbing but skip generation for now
     """
     logger.info("Starting imaging analysis pipeline for: %s", image_path)
-    classification = classify_pneumonia(image_path)
+    initialize_imaging_models()
+    # Read and decode once; the classifier and the explainer share the same image.
+    data, image = _load_image(image_path)
+    classification = _classify_images([image])[0]
     _log_classification_result(classification)
 
-    explanation = generate_pneumonia_explanation(
-        image_path=image_path,
+    explanation = _explain_image(
+        image_path,
+        data,
+        image,
         pneumonia_positive=classification["pneumonia_positive"],
         probability=classification["probability"],
     )
 
     logger.info("Imaging analysis pipeline complete for: %s", image_path)
-    return {
-        "triggered": True,
-        "image_path": image_path,
-        "pneumonia_positive": classification["pneumonia_positive"],
-        "probability": classification["probability"],
-        "decile": classification["decile"],
-        "band_label": classification["band_label"],
-        "explanation": explanation,
-    }
+    return _imaging_result(image_path, classification, explanation)
+
+
+def analyze_imaging_batch(image_paths):
+    """Same as analyze_imaging for many images, classifying them in batched forward passes."""
+    logger.info("Starting batched imaging analysis for %d images.", len(image_paths))
+    initialize_imaging_models()
+    loaded = _load_images(image_paths)
+    classifications = _classify_in_batches([image for _, image in loaded])
+
+    results = []
+    for image_path, (data, image), classification in zip(image_paths, loaded, classifications):
+        _log_classification_result(classification)
+        explanation = _explain_image(
+            image_path,
+            data,
+            image,
+            pneumonia_positive=classification["pneumonia_positive"],
+            probability=classification["probability"],
+        )
+        results.append(_imaging_result(image_path, classification, explanation))
+    return results
 
 
 def run(image_path=None):
@@ -410,7 +698,10 @@ def run(image_path=None):
 
     logger.info("run() invoked for imaging path: %s", image_path)
     result = analyze_imaging(image_path=image_path)
+    return _format_result(result)
 
+
+def _format_result(result):
     return (
         f"Imaging prediction: {result['band_label']} "
         f"(probability={result['probability']:.4f}, decile={result['decile']}). "
@@ -418,8 +709,10 @@ def run(image_path=None):
     )
 
 
-try:
-    initialize_imaging_models()
-except Exception as exc:
-    _MODEL_INIT_ERROR = exc
-    logger.exception("Imaging model initialization failed during module import: %s", exc)
\ No newline at end of file
+def run_batch(image_paths):
+    if not image_paths:
+        logger.warning("run_batch() called without image_paths.")
+        return []
+
+    return [_format_result(result) for result in analyze_imaging_batch(image_paths)]
+
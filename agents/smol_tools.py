@@ -1,9 +1,11 @@
-from typing import Optional
+from typing import List, Optional
 from smolagents import tool
-from agents.imaging_agent import run as imaging_agent_run
 from agents.hematology_agent import run as hematology_agent_run
+from agents.hematology_agent import run_batch as hematology_agent_run_batch
 
 def run_imaging_analysis_impl(image_path: Optional[str] = None) -> str:
+    # Imported here so hematology-only tool use never loads torch/transformers.
+    from agents.imaging_agent import run as imaging_agent_run
     return imaging_agent_run(image_path=image_path)
 
 @tool
@@ -14,6 +16,18 @@ def run_imaging_analysis(image_path: Optional[str] = None) -> str:
     """
     return run_imaging_analysis_impl(image_path)
 
+def run_imaging_analysis_batch_impl(image_paths: List[str]) -> str:
+    from agents.imaging_agent import run_batch as imaging_agent_run_batch
+    return "\n".join(imaging_agent_run_batch(image_paths))
+
+@tool
+def run_imaging_analysis_batch(image_paths: List[str]) -> str:
+    """Run imaging analysis on several chest X-rays, classifying them in batches. Returns one prediction line per image.
+    Args:
+        image_paths: Paths to the image files.
+    """
+    return run_imaging_analysis_batch_impl(image_paths)
+
 def check_hematology_report_impl(report_path: str) -> str:
     return hematology_agent_run(report_path=report_path)
 
@@ -24,3 +38,14 @@ def check_hematology_report(report_path: str) -> str:
         report_path: Path to the report file, e.g. positive/patient1.txt or negative/patient1.txt.
     """
     return check_hematology_report_impl(report_path)
+
+def check_hematology_reports_impl(report_paths: List[str]) -> str:
+    return "\n".join(hematology_agent_run_batch(report_paths))
+
+@tool
+def check_hematology_reports(report_paths: List[str]) -> str:
+    """Check several hematology reports for pneumonia markers in one batched LLM call. Returns one verdict line per report.
+    Args:
+        report_paths: Paths to the report files, e.g. ["positive/patient1.txt", "negative/patient1.txt"].
+    """
+    return check_hematology_reports_impl(report_paths)
@@ -1,12 +1,25 @@
-import json
+import itertools
+import mimetypes
+import os
+import queue
+import secrets
+import shutil
 import sys
+import tempfile
 import threading
 import time
-import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 from pathlib import Path
+from urllib.parse import quote
 
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, Request, Response, jsonify, request, send_file
+from werkzeug.wsgi import FileWrapper
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 REPO_ROOT = Path(__file__).resolve().parents[2]
 if str(REPO_ROOT) not in sys.path:
@@ -14,16 +27,76 @@ if str(REPO_ROOT) not in sys.path:
 
 from orchestrator import run_patient_workflow  # noqa: E402
 
-BASE_DIR = Path(__file__).resolve().parents[1]
-DATA_DIR = BASE_DIR / "data"
+import storage  # noqa: E402
+
+DATA_DIR = storage.DATA_DIR
 SUBMISSIONS_DIR = DATA_DIR / "submissions"
-DB_PATH = DATA_DIR / "claims_db.json"
-POLL_INTERVAL_SECONDS = 2
+# stored_path is already resolved at upload, so containment is a prefix test against this.
+_SUBMISSIONS_ROOT = str(SUBMISSIONS_DIR.resolve()) + os.sep
 IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp", ".tiff"}
 
-db_lock = threading.Lock()
+# Submission ids waiting for the orchestrator; fed by submit_claim and on startup.
+work_queue: "queue.Queue[str]" = queue.Queue()
+# Model calls are I/O-bound (Ollama, HF), so several claims can be processed at once.
+CLAIM_WORKERS = 4
+claim_executor = ThreadPoolExecutor(max_workers=CLAIM_WORKERS, thread_name_prefix="claim")
+
+# Behind a reverse proxy, let it stream report files from disk instead of this process:
+# DASHBOARD_USE_X_SENDFILE=1 for Apache/lighttpd (X-Sendfile), or DASHBOARD_X_ACCEL_PREFIX
+# set to an nginx `internal` location aliased to data/submissions/ (X-Accel-Redirect).
+X_ACCEL_PREFIX = os.environ.get("DASHBOARD_X_ACCEL_PREFIX", "")
+
+# A stored report never changes (a re-upload gets a new submission id), so browsers may
+# keep it for a day without revalidating. Private: these are patient records, and shared
+# proxies or CDNs must not store them.
+REPORT_CACHE_MAX_AGE = 86400
+
+UPLOAD_DIR_ENVIRON_KEY = "dashboard.upload_dir"
+# Temp files are created 0600; stored reports get the usual 0666 & ~umask, like a plain save,
+# so a reverse proxy serving them via X-Sendfile/X-Accel-Redirect can read them.
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+REPORT_FILE_MODE = 0o666 & ~_UMASK
+# Scans and x-rays run to tens of MB; copy them in 1 MiB blocks rather than the 8 KiB defaults.
+FILE_BUFFER_SIZE = 1 << 20
+
+
+def safe_upload_name(filename):
+    name = Path(filename or "").name
+    if name in ("", ".", ".."):
+        return None
+    return name
+
+
+class UploadRequest(Request):
+    """Writes uploaded files into the claim's directory while the multipart body is parsed.
+
+    Werkzeug otherwise spools each file to memory or a temp file, which the handler then
+    copies again. Each part lands in its own temp file in a spool directory next to
+    `reports/` (the stream factory is not told the field name); the handler renames the
+    `reports` parts into place and removes the spool directory with whatever is left.
+    The handler sets the spool directory in the WSGI environ before it reads `request.files`.
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        upload_dir = self.environ.get(UPLOAD_DIR_ENVIRON_KEY)
+        if upload_dir is None or not safe_upload_name(filename):
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        return tempfile.NamedTemporaryFile(
+            "w+b", buffering=FILE_BUFFER_SIZE, dir=upload_dir, delete=False
+        )
+
 
 app = Flask(__name__)
+app.request_class = UploadRequest
+app.config["USE_X_SENDFILE"] = os.environ.get("DASHBOARD_USE_X_SENDFILE") == "1"
+
+
+def jsonify_fast(obj) -> Response:
+    # Claim listings embed long agent explanations; orjson encodes them several times faster.
+    if orjson is None:
+        return jsonify(obj)
+    return Response(orjson.dumps(obj), mimetype="application/json")
 
 
 def now_iso() -> str:
@@ -33,38 +106,39 @@ def now_iso() -> str:
 def ensure_storage() -> None:
     DATA_DIR.mkdir(parents=True, exist_ok=True)
     SUBMISSIONS_DIR.mkdir(parents=True, exist_ok=True)
-    if not DB_PATH.exists():
-        DB_PATH.write_text(json.dumps({"claims": []}, indent=2), encoding="utf-8")
+    storage.init_db()
 
 
-def load_db() -> dict:
-    ensure_storage()
-    with db_lock:
-        return json.loads(DB_PATH.read_text(encoding="utf-8"))
+# Per-process counter from a random start: ids never repeat within a process, and two
+# processes only collide if they land on the same value in the same second.
+_submission_counter = itertools.count(secrets.randbits(32))
 
 
-def save_db(db_data: dict) -> None:
-    with db_lock:
-        DB_PATH.write_text(json.dumps(db_data, indent=2), encoding="utf-8")
+def generate_submission_id() -> str:
+    ts = time.strftime("%Y%m%d%H%M%S", time.gmtime())
+    suffix = next(_submission_counter) & 0xFFFFFFFF
+    return f"CLM-{ts}-{suffix:08x}"
 
 
-def generate_submission_id() -> str:
-    ts = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
-    suffix = uuid.uuid4().hex[:8]
-    return f"CLM-{ts}-{suffix}"
+def classify_report(filename: str) -> str:
+    return "imaging" if Path(filename).suffix.lower() in IMAGE_EXTENSIONS else "hematology"
+
+
+def report_kind(report: dict) -> str:
+    # "kind" is set at upload; claims stored before it existed fall back to the suffix.
+    return report.get("kind") or classify_report(report["filename"])
 
 
 def run_orchestrator_for_claim(claim: dict) -> dict:
     image_path = None
     hematology_path = None
     for report in claim.get("reports", []):
-        report_path = Path(report["stored_path"])
-        if report_path.suffix.lower() in IMAGE_EXTENSIONS:
+        if report_kind(report) == "imaging":
             if image_path is None:
-                image_path = str(report_path)
+                image_path = report["stored_path"]
         else:
             if hematology_path is None:
-                hematology_path = str(report_path)
+                hematology_path = report["stored_path"]
 
     return run_patient_workflow(
         image_path=image_path,
@@ -72,9 +146,22 @@ def run_orchestrator_for_claim(claim: dict) -> dict:
     )
 
 
+def drop_from_page_cache(path: str) -> None:
+    # Reports are read by the agents once and then rarely; don't let them crowd the page cache.
+    if not hasattr(os, "posix_fadvise"):
+        return
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
 def process_submission(submission_id: str) -> None:
-    db_data = load_db()
-    claim = next((c for c in db_data["claims"] if c["submission_id"] == submission_id), None)
+    claim = storage.get_claim(submission_id)
     if not claim:
         return
     if claim["status"] != "Under Review":
@@ -93,8 +180,7 @@ def process_submission(submission_id: str) -> None:
         item.get("agent"): item for item in orchestrator_result.get("agent_results", [])
     }
     for report in claim["reports"]:
-        report_path = Path(report["stored_path"])
-        agent_name = "imaging" if report_path.suffix.lower() in IMAGE_EXTENSIONS else "hematology"
+        agent_name = report_kind(report)
         agent_result = agent_result_by_name.get(agent_name)
         if agent_result:
             report["explanation"] = agent_result.get("explanation", "")
@@ -108,7 +194,10 @@ def process_submission(submission_id: str) -> None:
     claim["status"] = orchestrator_result.get("status", "uncertain")
     claim["final_evaluation"] = claim["status"]
     claim["updated_at"] = now_iso()
-    save_db(db_data)
+    storage.save_processed_claim(claim)
+
+    for report in claim["reports"]:
+        drop_from_page_cache(report["stored_path"])
 
 
 class SubmissionListener(threading.Thread):
@@ -117,15 +206,20 @@ class SubmissionListener(threading.Thread):
 
     def run(self) -> None:
         while True:
-            db_data = load_db()
-            pending = [
-                item["submission_id"]
-                for item in db_data["claims"]
-                if item["status"] == "Under Review"
-            ]
-            for submission_id in pending:
-                process_submission(submission_id)
-            time.sleep(POLL_INTERVAL_SECONDS)
+            submission_id = work_queue.get()
+            future = claim_executor.submit(process_submission, submission_id)
+            future.add_done_callback(
+                lambda done, sid=submission_id: _on_submission_done(sid, done)
+            )
+
+
+def _on_submission_done(submission_id: str, future) -> None:
+    try:
+        exc = future.exception()
+        if exc is not None:
+            app.logger.error("Processing %s failed: %s", submission_id, exc)
+    finally:
+        work_queue.task_done()
 
 
 @app.after_request
@@ -138,85 +232,122 @@ def add_cors_headers(response):
 
 @app.route("/api/claims", methods=["GET"])
 def list_claims():
-    db_data = load_db()
-    claims_sorted = sorted(db_data["claims"], key=lambda c: c["created_at"], reverse=True)
-    return jsonify({"claims": claims_sorted})
+    return jsonify_fast({"claims": storage.list_claims()})
 
 
 @app.route("/api/claims/uncertain", methods=["GET"])
 def list_uncertain_claims():
-    db_data = load_db()
-    uncertain_claims = [claim for claim in db_data["claims"] if claim["status"] == "uncertain"]
-    uncertain_claims.sort(key=lambda c: c["created_at"], reverse=True)
-    return jsonify({"claims": uncertain_claims})
+    return jsonify_fast({"claims": storage.list_claims(status="uncertain")})
 
 
 @app.route("/api/claims/<submission_id>", methods=["GET"])
 def get_claim(submission_id: str):
-    db_data = load_db()
-    claim = next((c for c in db_data["claims"] if c["submission_id"] == submission_id), None)
+    claim = storage.get_claim(submission_id)
     if not claim:
-        return jsonify({"error": "Claim not found."}), 404
-    return jsonify({"claim": claim})
+        return jsonify_fast({"error": "Claim not found."}), 404
+    return jsonify_fast({"claim": claim})
+
+
+def _cache_in_browser(response: Response) -> Response:
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.max_age = REPORT_CACHE_MAX_AGE
+    response.cache_control.immutable = True
+    return response
+
+
+def _buffered_file_wrapper(file, buffer_size=FILE_BUFFER_SIZE):
+    return FileWrapper(file, max(buffer_size, FILE_BUFFER_SIZE))
 
 
 @app.route("/api/claims/<submission_id>/reports/<path:filename>", methods=["GET"])
 def get_report_file(submission_id: str, filename: str):
-    db_data = load_db()
-    claim = next((c for c in db_data["claims"] if c["submission_id"] == submission_id), None)
-    if not claim:
-        return jsonify({"error": "Claim not found."}), 404
+    if not storage.has_claim(submission_id):
+        return jsonify_fast({"error": "Claim not found."}), 404
 
-    report = next((r for r in claim["reports"] if r["filename"] == filename), None)
+    report = storage.get_report(submission_id, filename)
     if not report:
-        return jsonify({"error": "Report not found for this claim."}), 404
-
-    report_path = Path(report["stored_path"]).resolve()
+        return jsonify_fast({"error": "Report not found for this claim."}), 404
+
+    stored_path = report["stored_path"]
+    if not stored_path.startswith(_SUBMISSIONS_ROOT):
+        return jsonify_fast({"error": "Invalid report path."}), 400
+    report_path = Path(stored_path)
+
+    # No exists() pre-check: send_file's own stat reports a missing file, and the proxy
+    # answers 404 itself for X-Accel-Redirect.
+    if X_ACCEL_PREFIX:
+        relative = stored_path[len(_SUBMISSIONS_ROOT):].replace(os.sep, "/")
+        response = Response(mimetype=mimetypes.guess_type(report_path.name)[0])
+        response.headers["X-Accel-Redirect"] = X_ACCEL_PREFIX.rstrip("/") + "/" + quote(relative)
+        return _cache_in_browser(response)
+
+    # conditional=True: ETag/Last-Modified and Range support; served via wsgi.file_wrapper
+    # (sendfile(2) under gunicorn) when the server provides one, otherwise in 1 MiB reads.
+    request.environ.setdefault("wsgi.file_wrapper", _buffered_file_wrapper)
     try:
-        report_path.relative_to(SUBMISSIONS_DIR.resolve())
-    except ValueError:
-        return jsonify({"error": "Invalid report path."}), 400
-
-    if not report_path.exists():
-        return jsonify({"error": "Report file does not exist."}), 404
-
-    return send_file(report_path, as_attachment=False)
+        response = send_file(
+            report_path, as_attachment=False, conditional=True, max_age=REPORT_CACHE_MAX_AGE
+        )
+    except FileNotFoundError:
+        return jsonify_fast({"error": "Report file does not exist."}), 404
+    return _cache_in_browser(response)
 
 
 @app.route("/api/claims", methods=["POST"])
 def submit_claim():
+    submission_id = generate_submission_id()
+    claim_root = SUBMISSIONS_DIR / submission_id
+    reports_dir = claim_root / "reports"
+    spool_dir = claim_root / ".parts"
+    reports_dir.mkdir(parents=True, exist_ok=True)
+    spool_dir.mkdir(exist_ok=True)
+    # Must be set before request.files is first touched; see UploadRequest.
+    request.environ[UPLOAD_DIR_ENVIRON_KEY] = spool_dir
+
+    try:
+        request.files
+    except Exception:
+        # Client disconnect, 413 and the like: drop the partial parts with the directory.
+        shutil.rmtree(claim_root, ignore_errors=True)
+        raise
+
     if "reports" not in request.files:
-        return jsonify({"error": "At least one report file is required under 'reports'."}), 400
+        shutil.rmtree(claim_root, ignore_errors=True)
+        return jsonify_fast({"error": "At least one report file is required under 'reports'."}), 400
 
     files = request.files.getlist("reports")
     if not files or all(file.filename == "" for file in files):
-        return jsonify({"error": "Please upload at least one report file."}), 400
+        shutil.rmtree(claim_root, ignore_errors=True)
+        return jsonify_fast({"error": "Please upload at least one report file."}), 400
 
     comments = request.form.get("comments", "")
-    submission_id = generate_submission_id()
-
-    claim_root = SUBMISSIONS_DIR / submission_id
-    reports_dir = claim_root / "reports"
-    reports_dir.mkdir(parents=True, exist_ok=True)
 
     reports_payload = []
     for uploaded_file in files:
-        if not uploaded_file.filename:
+        safe_name = safe_upload_name(uploaded_file.filename)
+        if not safe_name:
             continue
-        safe_name = Path(uploaded_file.filename).name
         destination = reports_dir / safe_name
-        uploaded_file.save(destination)
+        # The multipart parser already streamed the body into a temp file in `spool_dir`.
+        uploaded_file.close()
+        os.replace(uploaded_file.stream.name, destination)
+        os.chmod(destination, REPORT_FILE_MODE)
         reports_payload.append(
             {
                 "filename": safe_name,
                 "stored_path": str(destination.resolve()),
+                "kind": classify_report(safe_name),
                 "explanation": "",
                 "report_evaluation": "pending",
             }
         )
 
     if not reports_payload:
-        return jsonify({"error": "No valid report files received."}), 400
+        shutil.rmtree(claim_root, ignore_errors=True)
+        return jsonify_fast({"error": "No valid report files received."}), 400
+    # Parts from other form fields, or ones superseded by a later part with the same name.
+    shutil.rmtree(spool_dir, ignore_errors=True)
 
     claim = {
         "submission_id": submission_id,
@@ -229,11 +360,10 @@ def submit_claim():
         "reports": reports_payload,
     }
 
-    db_data = load_db()
-    db_data["claims"].append(claim)
-    save_db(db_data)
+    storage.insert_claim(claim)
+    work_queue.put(submission_id)
 
-    return jsonify({"submission_id": submission_id, "status": claim["status"]}), 201
+    return jsonify_fast({"submission_id": submission_id, "status": claim["status"]}), 201
 
 
 @app.route("/api/claims/<submission_id>/practitioner-review", methods=["PATCH"])
@@ -242,33 +372,32 @@ def practitioner_review(submission_id: str):
     status = payload.get("status")
     comment = payload.get("comment", "")
     if status not in {"accept", "reject", "uncertain"}:
-        return jsonify({"error": "Status must be one of: accept, reject, uncertain."}), 400
+        return jsonify_fast({"error": "Status must be one of: accept, reject, uncertain."}), 400
 
-    db_data = load_db()
-    claim = next((c for c in db_data["claims"] if c["submission_id"] == submission_id), None)
+    claim = storage.get_claim(submission_id)
     if not claim:
-        return jsonify({"error": "Claim not found."}), 404
-    if claim["status"] != "uncertain":
-        return jsonify({"error": "Only claims with uncertain status can be updated by practitioner."}), 400
+        return jsonify_fast({"error": "Claim not found."}), 404
 
-    claim["status"] = status
-    claim["final_evaluation"] = status
-    claim["practitioner_comment"] = comment
-    claim["updated_at"] = now_iso()
-    save_db(db_data)
-    return jsonify({"submission_id": submission_id, "status": status}), 200
+    # Conditional update, so a concurrent review cannot overwrite an already-final claim.
+    if not storage.update_status_if(submission_id, "uncertain", status, comment, now_iso()):
+        return jsonify_fast({"error": "Only claims with uncertain status can be updated by practitioner."}), 400
+    return jsonify_fast({"submission_id": submission_id, "status": status}), 200
 
 
 @app.route("/api/health", methods=["GET"])
 def health():
-    return jsonify({"status": "ok"})
+    return jsonify_fast({"status": "ok"})
 
 
 def start_listener() -> None:
+    # Re-queue claims left unprocessed by a previous run before accepting new ones.
+    for submission_id in storage.pending_submission_ids("Under Review"):
+        work_queue.put(submission_id)
     listener = SubmissionListener()
     listener.start()
 
 
+# Development server; production runs wsgi.py under gunicorn (see dashboard/README.md).
 if __name__ == "__main__":
     ensure_storage()
     start_listener()
@@ -0,0 +1,263 @@
+import copy
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parents[1]
+DATA_DIR = BASE_DIR / "data"
+DB_PATH = DATA_DIR / "claims.db"
+LEGACY_JSON_PATH = DATA_DIR / "claims_db.json"
+
+CLAIM_COLUMNS = (
+    "submission_id",
+    "comments",
+    "status",
+    "final_evaluation",
+    "practitioner_comment",
+    "created_at",
+    "updated_at",
+)
+REPORT_COLUMNS = ("filename", "stored_path", "kind", "explanation", "report_evaluation")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS claims (
+    submission_id TEXT PRIMARY KEY,
+    comments TEXT,
+    status TEXT,
+    final_evaluation TEXT,
+    practitioner_comment TEXT,
+    created_at TEXT,
+    updated_at TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_status_created ON claims(status, created_at DESC);
+CREATE INDEX IF NOT EXISTS idx_created ON claims(created_at DESC);
+CREATE TABLE IF NOT EXISTS reports (
+    submission_id TEXT,
+    filename TEXT,
+    stored_path TEXT,
+    kind TEXT,
+    explanation TEXT,
+    report_evaluation TEXT,
+    PRIMARY KEY (submission_id, filename)
+);
+"""
+
+# One connection per thread; SQLite serializes writers, so no application lock is needed.
+_local = threading.local()
+
+
+def _connect() -> sqlite3.Connection:
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        conn = sqlite3.connect(DB_PATH, isolation_level=None, check_same_thread=False, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        _local.conn = conn
+    return conn
+
+
+def init_db() -> None:
+    conn = _connect()
+    conn.executescript(SCHEMA)
+    _add_missing_report_columns(conn)
+    _import_legacy_json(conn)
+
+
+def _add_missing_report_columns(conn: sqlite3.Connection) -> None:
+    # Databases created before a column was added; new columns start out NULL.
+    existing = {row["name"] for row in conn.execute("PRAGMA table_info(reports)")}
+    for column in REPORT_COLUMNS:
+        if column not in existing:
+            conn.execute(f"ALTER TABLE reports ADD COLUMN {column} TEXT")
+
+
+def _import_legacy_json(conn: sqlite3.Connection) -> None:
+    # One-time import of claims stored by the previous JSON-file backend.
+    if not LEGACY_JSON_PATH.exists():
+        return
+    if conn.execute("SELECT 1 FROM claims LIMIT 1").fetchone():
+        return
+
+    legacy = json.loads(LEGACY_JSON_PATH.read_text(encoding="utf-8"))
+    for claim in legacy.get("claims", []):
+        insert_claim(claim)
+
+
+def _claims_with_reports(conn: sqlite3.Connection, claim_rows) -> list:
+    claims = [dict(row) for row in claim_rows]
+    if not claims:
+        return []
+
+    by_id = {}
+    for claim in claims:
+        claim["reports"] = []
+        by_id[claim["submission_id"]] = claim
+
+    placeholders = ",".join("?" for _ in by_id)
+    report_rows = conn.execute(
+        f"SELECT submission_id, {', '.join(REPORT_COLUMNS)} FROM reports "
+        f"WHERE submission_id IN ({placeholders}) ORDER BY rowid",
+        list(by_id),
+    )
+    for row in report_rows:
+        report = dict(row)
+        by_id[report.pop("submission_id")]["reports"].append(report)
+    return claims
+
+
+# Write-through cache of every claim. Reads never touch SQLite after the first load; each
+# write updates SQLite and then swaps in a fresh dict, so cached dicts are never mutated
+# and can be handed to read-only callers as-is. Assumes a single server process.
+# _claims_by_id is kept in created_at order (oldest first), so listings need no sort.
+_cache_lock = threading.RLock()
+_claims_by_id = None
+_reports_by_key = {}
+
+
+def _cached_claims() -> dict:
+    global _claims_by_id
+    with _cache_lock:
+        if _claims_by_id is None:
+            conn = _connect()
+            rows = conn.execute(
+                f"SELECT {', '.join(CLAIM_COLUMNS)} FROM claims ORDER BY created_at"
+            ).fetchall()
+            _claims_by_id = {}
+            for claim in _claims_with_reports(conn, rows):
+                _index_claim(claim)
+        return _claims_by_id
+
+
+def _index_claim(entry: dict) -> None:
+    # Caller holds _cache_lock. Keeps the (submission_id, filename) report index in step.
+    _claims_by_id[entry["submission_id"]] = entry
+    for report in entry["reports"]:
+        _reports_by_key[(entry["submission_id"], report["filename"])] = report
+
+
+def list_claims(status: str = None) -> list:
+    """Claims newest first. The returned dicts are shared with the cache: do not mutate them."""
+    with _cache_lock:
+        claims = list(_cached_claims().values())
+    claims.reverse()
+    if status is None:
+        return claims
+    return [claim for claim in claims if claim["status"] == status]
+
+
+def get_claim(submission_id: str):
+    claim = _cached_claims().get(submission_id)
+    return copy.deepcopy(claim) if claim is not None else None
+
+
+def has_claim(submission_id: str) -> bool:
+    return submission_id in _cached_claims()
+
+
+def get_report(submission_id: str, filename: str):
+    """Report entry for one uploaded file, or None. Shared with the cache: do not mutate it."""
+    _cached_claims()
+    return _reports_by_key.get((submission_id, filename))
+
+
+def pending_submission_ids(status: str) -> list:
+    with _cache_lock:
+        claims = list(_cached_claims().values())
+    return [claim["submission_id"] for claim in claims if claim["status"] == status]
+
+
+def insert_claim(claim: dict) -> None:
+    conn = _connect()
+    with _cache_lock:
+        with conn:
+            conn.execute("BEGIN")
+            conn.execute(
+                f"INSERT INTO claims ({', '.join(CLAIM_COLUMNS)}) "
+                f"VALUES ({', '.join('?' for _ in CLAIM_COLUMNS)})",
+                [claim.get(column) for column in CLAIM_COLUMNS],
+            )
+            conn.executemany(
+                f"INSERT OR REPLACE INTO reports (submission_id, {', '.join(REPORT_COLUMNS)}) "
+                f"VALUES (?, {', '.join('?' for _ in REPORT_COLUMNS)})",
+                [
+                    [claim["submission_id"]] + [report.get(column) for column in REPORT_COLUMNS]
+                    for report in claim.get("reports", [])
+                ],
+            )
+        if _claims_by_id is not None:
+            _append_claim(_cache_entry(claim))
+
+
+def _append_claim(entry: dict) -> None:
+    # Caller holds _cache_lock. New claims are normally the newest; only re-sort when a
+    # concurrent submission was stamped earlier but committed later. The sorted copy is
+    # swapped in whole, so unlocked lookups never see a half-filled dict.
+    global _claims_by_id
+    newest = next(reversed(_claims_by_id.values()), None)
+    _index_claim(entry)
+    if newest is not None and entry["created_at"] < newest["created_at"]:
+        ordered = sorted(_claims_by_id.values(), key=lambda c: c["created_at"])
+        _claims_by_id = {claim["submission_id"]: claim for claim in ordered}
+
+
+def _cache_entry(claim: dict) -> dict:
+    entry = {column: claim.get(column) for column in CLAIM_COLUMNS}
+    reports = {}
+    for report in claim.get("reports", []):
+        reports[report["filename"]] = {column: report.get(column) for column in REPORT_COLUMNS}
+    entry["reports"] = list(reports.values())
+    return entry
+
+
+def save_processed_claim(claim: dict) -> None:
+    """Persist the orchestrator outcome: claim status fields plus each report's evaluation."""
+    conn = _connect()
+    with _cache_lock:
+        with conn:
+            conn.execute("BEGIN")
+            conn.execute(
+                "UPDATE claims SET status = ?, final_evaluation = ?, updated_at = ? "
+                "WHERE submission_id = ?",
+                (claim["status"], claim["final_evaluation"], claim["updated_at"], claim["submission_id"]),
+            )
+            conn.executemany(
+                "UPDATE reports SET explanation = ?, report_evaluation = ? "
+                "WHERE submission_id = ? AND filename = ?",
+                [
+                    (report["explanation"], report["report_evaluation"], claim["submission_id"], report["filename"])
+                    for report in claim["reports"]
+                ],
+            )
+        if _claims_by_id is not None:
+            _index_claim(_cache_entry(claim))
+
+
+def update_status_if(
+    submission_id: str,
+    expected_status: str,
+    status: str,
+    practitioner_comment: str,
+    updated_at: str,
+) -> bool:
+    """Set the final status only if the claim is still in `expected_status`; returns whether it was."""
+    with _cache_lock:
+        cursor = _connect().execute(
+            "UPDATE claims SET status = ?, final_evaluation = ?, practitioner_comment = ?, updated_at = ? "
+            "WHERE submission_id = ? AND status = ?",
+            (status, status, practitioner_comment, updated_at, submission_id, expected_status),
+        )
+        if cursor.rowcount != 1:
+            return False
+        if _claims_by_id is not None and submission_id in _claims_by_id:
+            # Reports are unchanged, so the report index can keep pointing at them.
+            _claims_by_id[submission_id] = {
+                **_claims_by_id[submission_id],
+                "status": status,
+                "final_evaluation": status,
+                "practitioner_comment": practitioner_comment,
+                "updated_at": updated_at,
+            }
+        return True
@@ -0,0 +1,8 @@
+# Production entry point (run from dashboard/backend):
+#   gunicorn --workers 1 --worker-class gthread --threads 8 --bind 0.0.0.0:8081 wsgi:app
+# Keep a single worker: the claim cache and the submission queue live in this process.
+# Don't use --preload either, since the listener thread would stay behind in the master.
+from app import app, ensure_storage, start_listener
+
+ensure_storage()
+start_listener()
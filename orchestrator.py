@@ -1,7 +1,15 @@
+from concurrent.futures import ThreadPoolExecutor
+
 from agents.imaging_agent import analyze_imaging
 from agents.hematology_agent import analyze as analyze_hematology
 from agents.validator_agent import validate_claim
 
+# Long-lived agent threads, shared by every claim. Imaging keeps per-thread state (the pinned
+# input buffer and torch.compile's CUDA graphs), so it stays on one reused thread; the GPU
+# runs one model call at a time anyway. Hematology mostly waits on Ollama and can overlap.
+_IMAGING_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="imaging-agent")
+_HEMATOLOGY_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hematology-agent")
+
 
 def _imaging_band_decision(band_label):
     band_label = (band_label or "").upper()
@@ -19,8 +27,17 @@ def run_patient_workflow(image_path=None, hematology_report_path=None):
     imaging_payload = None
     hematology_payload = None
 
+    # The agents are independent (local model inference vs. an Ollama call), so run them together.
+    imaging_future = hematology_future = None
     if image_path:
-        imaging_result = analyze_imaging(image_path=image_path)
+        imaging_future = _IMAGING_EXECUTOR.submit(analyze_imaging, image_path=image_path)
+    if hematology_report_path:
+        hematology_future = _HEMATOLOGY_EXECUTOR.submit(
+            analyze_hematology, report_path=hematology_report_path
+        )
+
+    if imaging_future:
+        imaging_result = imaging_future.result()
 
         probability = imaging_result.get("probability")
         decile = imaging_result.get("decile")
@@ -44,8 +61,8 @@ def run_patient_workflow(image_path=None, hematology_report_path=None):
             }
         )
 
-    if hematology_report_path:
-        hema_result = analyze_hematology(report_path=hematology_report_path)
+    if hematology_future:
+        hema_result = hematology_future.result()
 
         hematology_payload = {
             "decision": hema_result.get("decision", "uncertain"),